@@ -1,12 +1,27 @@
 import re
+import os
+import csv
 import time
+import sqlite3
 import random
+import asyncio
+import functools
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from pathlib import Path
 from urllib.parse import urlparse
 
-import requests
+import ahocorasick
+import httpx
+from aiolimiter import AsyncLimiter
 import pandas as pd
-from lxml import etree, html
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import zstandard as zstd
+from lxml import etree
+from selectolax.lexbor import LexborHTMLParser
 
 
 # =========================
@@ -17,6 +32,13 @@ SITEMAP_URL = "https://aws.amazon.com/marketplace/sitemap.xml"
 HEADERS = {
     "User-Agent": "Mozilla/5.0",
     "Accept-Language": "en-US,en;q=0.9",
+    # ask for compressed bodies; httpx decompresses transparently, so
+    # r.content stays plain HTML. Only advertise br when a brotli
+    # decoder is actually importable (same check httpx makes for its
+    # own default header), otherwise decoding raises on every response.
+    "Accept-Encoding": "gzip, deflate"
+    + (", br" if importlib.util.find_spec("brotli")
+       or importlib.util.find_spec("brotlicffi") else ""),
 }
 
 DELAY_SECONDS = 1.5          # base delay between requests
@@ -27,47 +49,215 @@ MAX_RETRIES = 3              # retry only for transient errors
 SAMPLE_PRODUCTS_TOTAL = 300  # testing (increase to 1000/2000 later)
 RANDOM_SEED = 42
 
+MAX_CONCURRENCY = 16         # simultaneous requests in flight (the rate
+                             # limiter caps throughput anyway, so more
+                             # in-flight requests only add queueing)
+RATE_LIMIT_PER_SECOND = 5    # aggregate request rate across all coroutines
+
 OUT_PRODUCTS = "data/products_enriched_simple.csv"
+OUT_PRODUCTS_PARQUET = "data/products_enriched_simple.parquet"
 OUT_TAXONOMY = "data/urls_taxonomy_simple.csv"
 
+CACHE_DB = Path("data/http_cache.sqlite")
+CACHE_EXPIRE_SECONDS = 7 * 24 * 3600   # reruns within a week skip the network
+
+# output CSV columns, in row order
+FIELDNAMES = [
+    "url", "prodview_id", "product_name", "seller_name",
+    "category_primary", "categories_all", "delivery_method",
+    "pricing_type", "contract_terms", "price_visible",
+    "price_min_usd", "price_max_usd",
+    "reviews_page_exists", "reviews_supported", "aws_reviews_count",
+    "external_reviews_count", "avg_rating", "ratings_count",
+]
+
+# explicit dtypes for the output table: categoricals for the few-valued
+# labels, nullable ints/floats for the counts (missing values are
+# normal). Use these when loading the CSV back for analysis.
+OUTPUT_DTYPES = {
+    "pricing_type": "category",
+    "delivery_method": "category",
+    "price_visible": "int8",
+    "price_min_usd": "Float32",
+    "price_max_usd": "Float32",
+    "reviews_page_exists": "int8",
+    "reviews_supported": "int8",
+    "aws_reviews_count": "Int32",
+    "external_reviews_count": "Int32",
+    "avg_rating": "Float32",
+    "ratings_count": "Int32",
+}
+
+
+# =========================
+# Compiled regexes (hot path: compiled once, reused per page)
+# =========================
+_RE_WS = re.compile(r"\s+")
+_RE_SLUG = r"/marketplace/(?:pp|seller-profile|b)/(?P<slug>[^/?]+)"
+# product arm of _RE_SLUG, compiled for the streaming sitemap filter:
+# a product URL must carry a non-empty slug after pp/
+_RE_PP_SLUG = re.compile(r"/marketplace/pp/[^/?]")
+# Combined alternations: all numeric facts of a page are collected in a
+# single scan instead of one full-text pass per pattern. They only ever
+# run on normalized text (lowercased, single spaces), so they use plain
+# space literals and no IGNORECASE -- nothing here can backtrack badly,
+# even on corrupt HTML.
+_RE_PRICING_SCAN = re.compile(
+    r"\$ ?(?P<price>[0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)"
+    r"|\b(?P<term>\d+) ?-? ?month contract\b"
+)
+_RE_REVIEWS_SCAN = re.compile(
+    r"(?P<aws>\d[\d,]*) aws reviews\b"
+    r"|(?P<ext>\d[\d,]*) external reviews\b"
+    r"|(?P<ratings>\d[\d,]*) ratings\b"
+    r"|\b(?P<avg>[0-5]\.\d) out of 5\b"
+)
+
+
+# =========================
+# Keyword automatons (one Aho-Corasick pass instead of ~10 substring scans)
+# =========================
+# Payload is (priority, label): lower priority wins, mirroring the old
+# if-chains. Labels starting with "_" are markers for compound rules
+# (e.g. "container" alone is not enough to say Container delivery).
+_PRICING_KEYWORDS = {
+    "free trial": (0, "free_trial"),
+    "bring your own license": (1, "byol"),
+    "byol": (1, "byol"),
+    "usage-based": (2, "usage_based"),
+    "usage based": (2, "usage_based"),
+    "cost/hour": (3, "hourly"),
+    "hourly": (3, "hourly"),
+    "cost/month": (4, "monthly"),
+    "12-month contract": (5, "contract"),
+    "12 month contract": (5, "contract"),
+    "contact seller": (6, "contact_seller"),
+    "contact": (7, "_contact"),
+    "pricing": (7, "_pricing"),
+}
+
+_DELIVERY_KEYWORDS = {
+    "software as a service": (0, "SaaS"),
+    "(saas)": (0, "SaaS"),
+    "amazon machine image": (1, "AMI"),
+    "(ami)": (1, "AMI"),
+    "container": (2, "_container"),
+    "kubernetes": (2, "_orchestrator"),
+    "ecs": (2, "_orchestrator"),
+    "ecr": (2, "_orchestrator"),
+    "professional services": (3, "Professional Services"),
+    "data product": (4, "Data"),
+    "data exchange": (4, "Data"),
+    "data sets": (4, "Data"),
+}
+
+
+def _build_automaton(keywords):
+    automaton = ahocorasick.Automaton()
+    for phrase, payload in keywords.items():
+        automaton.add_word(phrase, payload)
+    automaton.make_automaton()
+    return automaton
+
+
+_PRICING_AUTOMATON = _build_automaton(_PRICING_KEYWORDS)
+_DELIVERY_AUTOMATON = _build_automaton(_DELIVERY_KEYWORDS)
+
+# shared (de)compressor instances for the on-disk cache: HTML squeezes
+# ~4-8x at level 3, so warm resumes read far fewer bytes
+_ZSTD_COMPRESS = zstd.ZstdCompressor(level=3)
+_ZSTD_DECOMPRESS = zstd.ZstdDecompressor()
+
 
 # =========================
 # Step 0: safe sleep
 # =========================
-def polite_sleep(mult=1.0):
-    time.sleep(mult * (DELAY_SECONDS + random.random() * JITTER_SECONDS))
+async def polite_sleep(mult=1.0):
+    await asyncio.sleep(mult * (DELAY_SECONDS + random.random() * JITTER_SECONDS))
 
 
 # =========================
-# Step 1: fetch with safe retries
+# Step 1: fetch with safe retries + on-disk cache
 # =========================
-def fetch(session, url):
+_CACHE_CONN = None
+
+
+def cache_conn():
+    """One SQLite KV store instead of thousands of small cache files."""
+    global _CACHE_CONN
+    if _CACHE_CONN is None:
+        _CACHE_CONN = sqlite3.connect(CACHE_DB, isolation_level=None)
+        _CACHE_CONN.execute("PRAGMA journal_mode=WAL")
+        _CACHE_CONN.execute("PRAGMA synchronous=NORMAL")
+        _CACHE_CONN.execute(
+            "CREATE TABLE IF NOT EXISTS cache(url TEXT PRIMARY KEY, body BLOB, ts INTEGER)"
+        )
+    return _CACHE_CONN
+
+
+def read_cache(url):
+    """Return cached body for url, b"" for a cached 404, None on miss."""
+    row = cache_conn().execute(
+        "SELECT body, ts FROM cache WHERE url = ?", (url,)
+    ).fetchone()
+    if row is None:
+        return None
+    body, ts = row
+    if time.time() - ts > CACHE_EXPIRE_SECONDS:
+        return None
+    return _ZSTD_DECOMPRESS.decompress(body) if body else b""
+
+
+def write_cache(url, body):
+    cache_conn().execute(
+        "INSERT OR REPLACE INTO cache(url, body, ts) VALUES (?, ?, ?)",
+        (url, _ZSTD_COMPRESS.compress(body) if body else b"", int(time.time())),
+    )
+
+
+async def fetch(session, url, sem, limiter):
     """
-    Fetch a URL safely.
-    - Do NOT retry 404 (page doesn't exist)
+    Fetch a URL safely (bounded by the shared semaphore and the shared
+    token-bucket limiter, which paces the aggregate request rate).
+    - Serve from the on-disk cache when possible (no rate-limit token)
+    - Do NOT retry 404 (page doesn't exist; cached so we don't re-hit it)
     - Retry 429 and 5xx (rate limiting / server errors)
     """
+    cached = read_cache(url)
+    if cached is not None:
+        return cached or None  # empty body marks a cached 404
+
     backoff = 2.0
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            r = session.get(url, headers=HEADERS, timeout=TIMEOUT)
+            async with sem:
+                async with limiter:
+                    r = await session.get(url)
 
             if r.status_code == 404:
+                write_cache(url, b"")  # remember the miss
                 return None  # no page -> no retry
 
             if r.status_code in (429, 500, 502, 503, 504):
-                print(f"[WARN] {r.status_code} {url} (attempt {attempt}) -> backoff")
-                polite_sleep(mult=backoff)
-                backoff *= 2
+                # honor the server's Retry-After hint when it sends one;
+                # otherwise fall back to our own exponential backoff
+                retry_after = r.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    print(f"[WARN] {r.status_code} {url} (attempt {attempt}) -> Retry-After {retry_after}s")
+                    await asyncio.sleep(int(retry_after))
+                else:
+                    print(f"[WARN] {r.status_code} {url} (attempt {attempt}) -> backoff")
+                    await polite_sleep(mult=backoff)
+                    backoff *= 2
                 continue
 
             r.raise_for_status()
-            polite_sleep()
+            write_cache(url, r.content)
             return r.content
 
         except Exception as e:
             print(f"[WARN] failed {url} (attempt {attempt}): {e}")
-            polite_sleep(mult=backoff)
+            await polite_sleep(mult=backoff)
             backoff *= 2
 
     return None
@@ -76,47 +266,52 @@ def fetch(session, url):
 # =========================
 # Step 2: parse sitemap -> get product URLs
 # =========================
-def classify_url(url):
-    if "/marketplace/pp/" in url:
-        return "product"
-    if "/marketplace/seller-profile/" in url:
-        return "seller"
-    if "/marketplace/b/" in url:
-        return "category"
-    return "other"
-
-
-def extract_slug(url, type_):
-    if type_ == "product":
-        m = re.search(r"/marketplace/pp/([^/?]+)", url)
-    elif type_ == "seller":
-        m = re.search(r"/marketplace/seller-profile/([^/?]+)", url)
-    elif type_ == "category":
-        m = re.search(r"/marketplace/b/([^/?]+)", url)
-    else:
-        return None
-    return m.group(1) if m else None
-
-
-def get_product_urls_from_sitemap(session):
+async def get_product_urls_from_sitemap(session, sem, limiter):
     print("[INFO] Fetching sitemap")
-    content = fetch(session, SITEMAP_URL)
+    content = await fetch(session, SITEMAP_URL, sem, limiter)
     if not content:
         raise RuntimeError("Could not fetch sitemap")
 
-    xml = etree.parse(BytesIO(content))
-    urls = [el.text for el in xml.findall(".//{*}loc") if el.text]
+    # Stream the XML instead of building the whole tree in memory:
+    # only <loc> elements are materialized and each is freed right away.
+    # Product URLs are filtered and deduped in the same pass (dict keys
+    # keep first-seen order), so the DataFrame below only serves the
+    # taxonomy CSV.
+    urls = []
+    product_urls = {}
+    for _, elem in etree.iterparse(BytesIO(content), tag="{*}loc"):
+        text = elem.text
+        if text:
+            urls.append(text)
+            if _RE_PP_SLUG.search(text):
+                product_urls[text] = None
+        elem.clear()
     print(f"[INFO] Total URLs found in sitemap: {len(urls)}")
 
-    df = pd.DataFrame({"url": urls})
-    df["type"] = df["url"].apply(classify_url)
-    df["slug"] = df.apply(lambda row: extract_slug(row["url"], row["type"]), axis=1)
-
-    df = df[df["slug"].notnull()].copy()
-    df.to_csv(OUT_TAXONOMY, index=False)
+    # Arrow compute kernels: multi-threaded SIMD string matching, no
+    # per-row Python at all
+    arr = pa.array(urls)
+    type_ = pc.case_when(
+        pc.make_struct(
+            pc.match_substring(arr, "/marketplace/pp/"),
+            pc.match_substring(arr, "/marketplace/seller-profile/"),
+            pc.match_substring(arr, "/marketplace/b/"),
+        ),
+        "product", "seller", "category", "other",
+    )
+    # struct_field (unlike ChunkedArray.field) propagates the parent
+    # null mask, so non-matching URLs come back null, not ""
+    slug = pc.struct_field(pc.extract_regex(arr, _RE_SLUG), "slug")
+
+    taxonomy = pa.table({"url": arr, "type": type_, "slug": slug})
+    taxonomy = taxonomy.filter(pc.is_valid(slug))
+    # write to a temp file and rename: an interrupted run can never
+    # leave a truncated taxonomy behind
+    pa_csv.write_csv(taxonomy, OUT_TAXONOMY + ".part")
+    os.replace(OUT_TAXONOMY + ".part", OUT_TAXONOMY)
     print(f"[INFO] Saved taxonomy -> {OUT_TAXONOMY}")
 
-    product_urls = df[df["type"] == "product"]["url"].drop_duplicates().tolist()
+    product_urls = list(product_urls)
     print(f"[INFO] Product URLs found: {len(product_urls)}")
     return product_urls
 
@@ -124,7 +319,9 @@ def get_product_urls_from_sitemap(session):
 # =========================
 # Step 3: extract fields from product page
 # =========================
+@functools.lru_cache(maxsize=4096)
 def prodview_id_from_url(url):
+    # pure function of the URL, so memoized across repeated calls
     # last path element is typically prodview-xxxx
     path = urlparse(url).path.strip("/")
     last = path.split("/")[-1]
@@ -132,83 +329,79 @@ def prodview_id_from_url(url):
 
 
 def extract_product_name(tree):
-    title = tree.xpath("//title/text()")
-    if not title:
+    title = tree.css_first("title")
+    if title is None:
         return None
-    t = title[0].strip()
+    t = title.text().strip()
     if t.lower().startswith("aws marketplace:"):
         return t.split(":", 1)[1].strip()
     return t
 
 
 def extract_seller_name(tree):
-    sellers = tree.xpath("//a[contains(@href,'/marketplace/seller-profile')]/text()")
+    sellers = [n.text() for n in tree.css('a[href*="/marketplace/seller-profile"]')]
     sellers = [s.strip() for s in sellers if s and s.strip()]
     return sellers[0] if sellers else None
 
 
 def extract_categories(tree):
-    cats = tree.xpath("//a[contains(@href,'/marketplace/b/')]/text()")
+    cats = [n.text() for n in tree.css('a[href*="/marketplace/b/"]')]
     cats = [c.strip() for c in cats if c and c.strip()]
     primary = cats[0] if cats else None
     allcats = "|".join(cats) if cats else None
     return primary, allcats
 
 
-def detect_delivery_method(page_text):
-    t = page_text.lower()
-    if "software as a service" in t or "(saas)" in t:
-        return "SaaS"
-    if "amazon machine image" in t or "(ami)" in t:
-        return "AMI"
-    if "container" in t and ("kubernetes" in t or "ecs" in t or "ecr" in t):
-        return "Container"
-    if "professional services" in t:
-        return "Professional Services"
-    if "data product" in t or "data exchange" in t or "data sets" in t:
-        return "Data"
-    return None
+def detect_delivery_method(page_text_low):
+    # expects already-lowercased text (lowered once at the source)
+    hits = set(payload for _, payload in _DELIVERY_AUTOMATON.iter(page_text_low))
+    labels = set(label for _, label in hits)
+    candidates = [(prio, label) for prio, label in hits if not label.startswith("_")]
+    if "_container" in labels and "_orchestrator" in labels:
+        candidates.append((2, "Container"))
+    if not candidates:
+        return None
+    return min(candidates)[1]
 
 
 # =========================
 # Step 4: pricing (simple but useful)
 # =========================
-def classify_pricing(page_text):
-    t = page_text.lower()
-    if "free trial" in t:
-        return "free_trial"
-    if "bring your own license" in t or "byol" in t:
-        return "byol"
-    if "usage-based" in t or "usage based" in t:
-        return "usage_based"
-    if "cost/hour" in t or "hourly" in t:
-        return "hourly"
-    if "cost/month" in t:
-        return "monthly"
-    if "12-month contract" in t or "12 month contract" in t:
-        return "contract"
-    if "contact seller" in t or ("contact" in t and "pricing" in t):
-        return "contact_seller"
-    return "unknown"
-
-
-def extract_pricing(page_text):
-    pricing_type = classify_pricing(page_text)
-
-    # contract terms like "12-month contract"
-    terms = sorted(set(re.findall(r"\b(\d+)\s*-\s*month contract\b", page_text, flags=re.IGNORECASE)))
-    if not terms:
-        terms = sorted(set(re.findall(r"\b(\d+)\s*month contract\b", page_text, flags=re.IGNORECASE)))
-    contract_terms = ",".join([f"{x}-month" for x in terms]) if terms else None
-
-    # prices like $1,000.00
-    prices = re.findall(r"\$\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)", page_text)
+def classify_pricing(page_text_low):
+    # expects already-lowercased text (lowered once at the source)
+    hits = set(payload for _, payload in _PRICING_AUTOMATON.iter(page_text_low))
+    labels = set(label for _, label in hits)
+    candidates = [(prio, label) for prio, label in hits if not label.startswith("_")]
+    if "_contact" in labels and "_pricing" in labels:
+        candidates.append((7, "contact_seller"))
+    if not candidates:
+        return "unknown"
+    return min(candidates)[1]
+
+
+def extract_pricing(page_text_low):
+    # works on lowercased text: all patterns here match digits/symbols only
+    pricing_type = classify_pricing(page_text_low)
+
+    # one combined scan picks up prices ($1,000.00) and contract terms
+    # ("12-month contract") together; the cheap substring guard skips
+    # the scan completely for pages that can't match (no visible price)
+    terms_seen = 0  # bitmap over month counts: bit n set = "n-month contract" seen
     vals = []
-    for p in prices:
-        try:
-            vals.append(float(p.replace(",", "")))
-        except:
-            pass
+    if "$" in page_text_low or "month contract" in page_text_low:
+        for m in _RE_PRICING_SCAN.finditer(page_text_low):
+            price = m.group("price")
+            if price:
+                # the pattern only matches valid numbers -> no try/except
+                vals.append(float(price.replace(",", "")))
+            else:
+                n = int(m.group("term"))
+                if 1 <= n <= 63:
+                    terms_seen |= 1 << n
+
+    # iterating the bitmap yields proper numeric order (the old
+    # sorted(set_of_strings) put "12" before "3")
+    contract_terms = ",".join(f"{n}-month" for n in range(64) if terms_seen & (1 << n)) or None
 
     price_visible = 1 if vals else 0
     price_min = min(vals) if vals else None
@@ -224,11 +417,46 @@ def extract_pricing(page_text):
 
 
 # =========================
-# Step 5: reviews (from reviews-list page)
+# Step 5: reviews (inline summary or reviews-list page)
 # =========================
-def extract_reviews_from_reviews_page(session, prodview_id):
+def _to_int(x):
+    try:
+        return int(x.replace(",", ""))
+    except:
+        return None
+
+
+def parse_reviews_from_text(text):
+    """Scan normalized lowercased text for review counts and the rating.
+
+    One combined pass; keeps only the first hit per field (same as the
+    old per-pattern re.search).
+    """
+    aws_reviews = external_reviews = ratings_count = avg_rating = None
+    for m in _RE_REVIEWS_SCAN.finditer(text):
+        if m.group("aws") and aws_reviews is None:
+            aws_reviews = _to_int(m.group("aws"))
+        elif m.group("ext") and external_reviews is None:
+            external_reviews = _to_int(m.group("ext"))
+        elif m.group("ratings") and ratings_count is None:
+            ratings_count = _to_int(m.group("ratings"))
+        elif m.group("avg") and avg_rating is None:
+            try:
+                avg_rating = float(m.group("avg"))
+            except:
+                pass
+
+    return {
+        "aws_reviews_count": aws_reviews,
+        "external_reviews_count": external_reviews,
+        "avg_rating": avg_rating,
+        "ratings_count": ratings_count,
+    }
+
+
+async def extract_reviews_from_reviews_page(session, prodview_id, sem, limiter):
     reviews_url = f"https://aws.amazon.com/marketplace/reviews/reviews-list/{prodview_id}"
-    content = fetch(session, reviews_url)
+    content = await fetch(session, reviews_url, sem, limiter)
     if not content:
         # 404 or hard fail -> treat as no reviews page
         return {
@@ -240,11 +468,12 @@ def extract_reviews_from_reviews_page(session, prodview_id):
             "ratings_count": None,
         }
 
-    tree = html.fromstring(content)
-    text = re.sub(r"\s+", " ", tree.text_content()).strip()
-    low = text.lower()
+    tree = LexborHTMLParser(content)
+    # normalize whitespace and lowercase in one pass (all regexes below
+    # are case-insensitive anyway)
+    text = _RE_WS.sub(" ", tree.text(separator=" ").lower()).strip()
 
-    if "reviews are not supported" in low:
+    if "reviews are not supported" in text:
         return {
             "reviews_page_exists": 1,
             "reviews_supported": 0,
@@ -254,109 +483,161 @@ def extract_reviews_from_reviews_page(session, prodview_id):
             "ratings_count": None,
         }
 
-    def to_int(x):
-        try:
-            return int(x.replace(",", ""))
-        except:
-            return None
-
-    aws_reviews = None
-    m = re.search(r"(\d[\d,]*)\s+AWS reviews\b", text, flags=re.IGNORECASE)
-    if m:
-        aws_reviews = to_int(m.group(1))
-
-    external_reviews = None
-    m = re.search(r"(\d[\d,]*)\s+external reviews\b", text, flags=re.IGNORECASE)
-    if m:
-        external_reviews = to_int(m.group(1))
-
-    ratings_count = None
-    m = re.search(r"(\d[\d,]*)\s+ratings\b", text, flags=re.IGNORECASE)
-    if m:
-        ratings_count = to_int(m.group(1))
-
-    avg_rating = None
-    m = re.search(r"\b([0-5]\.\d)\s+out of 5\b", text, flags=re.IGNORECASE)
-    if m:
-        try:
-            avg_rating = float(m.group(1))
-        except:
-            pass
-
     return {
         "reviews_page_exists": 1,
         "reviews_supported": 1,
-        "aws_reviews_count": aws_reviews,
-        "external_reviews_count": external_reviews,
-        "avg_rating": avg_rating,
-        "ratings_count": ratings_count,
+        **parse_reviews_from_text(text),
     }
 
 
 # =========================
 # MAIN PIPELINE
 # =========================
-def main():
-    random.seed(RANDOM_SEED)
+def parse_product(content, url):
+    """Pure CPU step: parse one product page into its (partial) row dict.
+
+    No network access here so it can run in a worker process while the
+    event loop keeps fetching.
+    """
+    tree = LexborHTMLParser(content)
+    # scan the main product container when the page has one: it skips
+    # navigation/footer/related-products text, which is most of the DOM
+    container = tree.css_first("main") or tree.css_first("#aws-page-content") or tree.body
+    raw_text = container.text(separator=" ") if container is not None else tree.text(separator=" ")
+    # normalize whitespace and lowercase in one pass: every consumer of
+    # this text (classifiers, pricing regexes) works on lowercase
+    page_text_low = _RE_WS.sub(" ", raw_text.lower()).strip()
+
+    # the pricing markers live in a small panel of the page; scanning
+    # just that section keeps the regex work proportional to it, with
+    # the whole page as fallback when no such panel is found
+    pricing_node = tree.css_first('[class*="pricing"], [id*="pricing"]')
+    if pricing_node is not None:
+        pricing_text_low = _RE_WS.sub(" ", pricing_node.text(separator=" ").lower()).strip()
+    else:
+        pricing_text_low = page_text_low
+
+    pricing = extract_pricing(pricing_text_low)
+    category_primary, categories_all = extract_categories(tree)
 
-    with requests.Session() as session:
+    return {
+        "url": url,
+        "prodview_id": prodview_id_from_url(url),
+        "product_name": extract_product_name(tree),
+        "seller_name": extract_seller_name(tree),
+        "category_primary": category_primary,
+        "categories_all": categories_all,
+        "delivery_method": detect_delivery_method(page_text_low),
+        **pricing,
+        # many product pages embed the review summary; popped by the
+        # caller, which then skips the extra reviews-page request
+        "_inline_reviews": parse_reviews_from_text(page_text_low),
+    }
+
+
+async def process_product(session, url, sem, limiter, executor):
+    """Fetch one product page (and its reviews page) and build the output row."""
+    content = await fetch(session, url, sem, limiter)
+    if not content:
+        print(f"[SKIP] Could not fetch product page: {url}")
+        return None
+
+    # parse in a worker process so CPU work doesn't block the event loop
+    loop = asyncio.get_running_loop()
+    row = await loop.run_in_executor(executor, parse_product, content, url)
+    pid = row["prodview_id"]
+
+    # Prefer the review summary embedded in the product page: when it is
+    # there, the extra reviews-page request (and its rate-limit token)
+    # is not needed at all
+    inline = row.pop("_inline_reviews")
+    if inline["avg_rating"] is not None or inline["ratings_count"] is not None:
+        reviews = {"reviews_page_exists": 1, "reviews_supported": 1, **inline}
+    elif pid:
+        # Fetch reviews page (safe: 404 -> no retries)
+        reviews = await extract_reviews_from_reviews_page(session, pid, sem, limiter)
+    else:
+        reviews = {
+            "reviews_page_exists": 0,
+            "reviews_supported": 0,
+            "aws_reviews_count": None,
+            "external_reviews_count": None,
+            "avg_rating": None,
+            "ratings_count": None,
+        }
+    row.update(reviews)
+
+    print(f"[OK] {pid} | {row['product_name']} | pricing={row['pricing_type']} | reviews_page={reviews['reviews_page_exists']}")
+    return row
+
+
+async def main():
+    random.seed(RANDOM_SEED)
+    CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    # one token bucket shared by every coroutine: aggregate politeness
+    # without serializing the workers behind individual sleeps
+    limiter = AsyncLimiter(max_rate=RATE_LIMIT_PER_SECOND, time_period=1.0)
+    # HTTP/2: concurrent requests multiplex over a few keep-alive
+    # connections instead of paying one TCP+TLS handshake each; the
+    # transport retries connection-level failures on its own
+    limits = httpx.Limits(max_connections=128, max_keepalive_connections=MAX_CONCURRENCY)
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=MAX_RETRIES)
+    async with httpx.AsyncClient(transport=transport, headers=HEADERS, timeout=TIMEOUT,
+                                 follow_redirects=True) as session:
         # 1) Get product urls
-        product_urls = get_product_urls_from_sitemap(session)
+        product_urls = await get_product_urls_from_sitemap(session, sem, limiter)
 
         # 2) Sample
         if SAMPLE_PRODUCTS_TOTAL is not None:
             product_urls = random.sample(product_urls, k=min(SAMPLE_PRODUCTS_TOTAL, len(product_urls)))
             print(f"[INFO] Sampling {len(product_urls)} products")
 
-        rows = []
-        for i, url in enumerate(product_urls, 1):
-            print(f"\n[{i}/{len(product_urls)}] {url}")
-
-            # Fetch product page
-            content = fetch(session, url)
-            if not content:
-                print("[SKIP] Could not fetch product page")
-                continue
-
-            tree = html.fromstring(content)
-            page_text = re.sub(r"\s+", " ", tree.text_content()).strip()
-
-            pid = prodview_id_from_url(url)
-            product_name = extract_product_name(tree)
-            seller_name = extract_seller_name(tree)
-            category_primary, categories_all = extract_categories(tree)
-            delivery_method = detect_delivery_method(page_text)
-
-            pricing = extract_pricing(page_text)
-
-            # Fetch reviews page (safe: 404 -> no retries)
-            reviews = extract_reviews_from_reviews_page(session, pid) if pid else {
-                "reviews_page_exists": 0,
-                "reviews_supported": 0,
-                "aws_reviews_count": None,
-                "external_reviews_count": None,
-                "avg_rating": None,
-                "ratings_count": None,
-            }
-
-            row = {
-                "url": url,
-                "prodview_id": pid,
-                "product_name": product_name,
-                "seller_name": seller_name,
-                "category_primary": category_primary,
-                "categories_all": categories_all,
-                "delivery_method": delivery_method,
-                **pricing,
-                **reviews,
-            }
-            print(f"[OK] {pid} | {product_name} | pricing={pricing['pricing_type']} | reviews_page={reviews['reviews_page_exists']}")
-            rows.append(row)
-
-        df = pd.DataFrame(rows)
-        df.to_csv(OUT_PRODUCTS, index=False)
-        print(f"\n[DONE] Saved -> {OUT_PRODUCTS}")
+        # 3) Resume: skip URLs that already have a row in the output CSV
+        done_urls = frozenset()
+        have_output = os.path.exists(OUT_PRODUCTS) and os.path.getsize(OUT_PRODUCTS) > 0
+        if have_output:
+            # only the key column is loaded, as plain strings: resuming
+            # never needs the full rows back in memory
+            done_urls = frozenset(
+                pd.read_csv(OUT_PRODUCTS, usecols=["url"], dtype=str)["url"].dropna()
+            )
+            product_urls = [u for u in product_urls if u not in done_urls]
+            print(f"[INFO] Resume: {len(done_urls)} rows already saved, {len(product_urls)} to fetch")
+
+        # 4) Enrich all products concurrently (bounded by the semaphore);
+        #    parsing runs in worker processes alongside the fetches, and
+        #    every finished row is flushed to disk right away so a kill
+        #    mid-run loses nothing
+        saved = len(done_urls)
+        with open(OUT_PRODUCTS, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            # gate on the file, not on done_urls: a file that already
+            # has a header but no data rows must not get a second one
+            if not have_output:
+                writer.writeheader()
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                tasks = [process_product(session, url, sem, limiter, executor)
+                         for url in product_urls]
+                for coro in asyncio.as_completed(tasks):
+                    row = await coro
+                    if row:
+                        writer.writerow(row)
+                        f.flush()
+                        saved += 1
+
+        print(f"\n[DONE] {saved} rows saved -> {OUT_PRODUCTS}")
+
+        # typed Parquet export for analysis: zstd-compressed, with the
+        # categorical columns dictionary-encoded; the CSV stays as the
+        # crash-safe continuous save (and for loading into R)
+        if saved:
+            df = pd.read_csv(OUT_PRODUCTS).astype(OUTPUT_DTYPES)
+            df.to_parquet(OUT_PRODUCTS_PARQUET + ".part", compression="zstd", index=False)
+            os.replace(OUT_PRODUCTS_PARQUET + ".part", OUT_PRODUCTS_PARQUET)
+            print(f"[DONE] Parquet export -> {OUT_PRODUCTS_PARQUET}")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())